@@ -1,64 +1,266 @@
 import re
 import json
 import random
+import hashlib
+import time
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Max turns kept per autonomous conversation; older turns are evicted
+HISTORY_CAP = 32
+
+# Prompt templates, parsed once at import instead of re-walking f-string
+# opcodes on every turn. Prefix templates render once per character; turn
+# templates render per call with the dynamic history and round context.
+_DEBATE_PREFIX_TEMPLATE = """You are {name} in an autonomous debate about "{topic}" with {others}.
+
+Your personality: {personality}
+Your speaking style: {speaking_style}
+"""
+
+_DISCUSSION_PREFIX_TEMPLATE = """You are {name} in an autonomous discussion about "{topic}" with {others}.
+
+Your personality: {personality}
+Your speaking style: {speaking_style}
+"""
+
+_DEBATE_TURN_TEMPLATE = """{prefix}
+{history_text}
+
+This is round {round} of the debate. Present your argument passionately but respectfully.
+Be specific, use examples, and try to counter previous points if relevant.
+Respond in 1-2 sentences that show your character's unique perspective.
+
+Your response:"""
+
+_DISCUSSION_TURN_TEMPLATE = """{prefix}
+{history_text}
+
+Continue the discussion naturally. Share your thoughts, ask questions, or respond to what others have said.
+Stay true to your character while keeping the conversation flowing.
+Respond in 1-2 sentences.
+
+Your response:"""
+
+
+@dataclass(slots=True)
+class ConversationConfig:
+    """State for one autonomous conversation between characters
+
+    Slotted so the attribute reads on every tick are fixed-offset loads
+    instead of dict hashes, and many live configs stay compact.
+    """
+    type: str
+    topic: str
+    participants: List[str]
+    duration: str = 'until_stop'
+    max_rounds: int = 6
+    # Each response is one half-round; integer so comparisons stay exact
+    half_rounds: int = 0
+    last_speaker: Optional[str] = None
+    # Nanosecond timestamp; format via ConversationOrchestrator._fmt_ts when needed
+    started_at_ns: int = 0
+    conversation_history: deque = field(default_factory=lambda: deque(maxlen=HISTORY_CAP))
+    # Running summary of turns that scrolled out of the verbatim window
+    summary: str = ''
+    # Internal bookkeeping for speaker selection and prompt reuse
+    prompt_prefix: Dict[str, str] = field(default_factory=dict)
+    others_strs: Dict[str, str] = field(default_factory=dict)
+    speaker_cycle: List[str] = field(default_factory=list)
+    speaker_idx: int = 0
+    last_idx: Optional[int] = None
+
+
 class ConversationOrchestrator:
+    # Response cache tuning: exact tier is an LRU keyed by prompt hash,
+    # semantic tier matches near-identical prompts by cosine similarity
+    CACHE_SIZE = 128
+    SEMANTIC_THRESHOLD = 0.92
+    EMBED_DIM = 256
+
+    # Turns kept verbatim in prompts; older ones get folded into a summary
+    VERBATIM_TURNS = 4
+
+    # After this many consecutive API failures, skip straight to the
+    # fallback response for a backoff window instead of rebuilding prompts
+    ERROR_BACKOFF_THRESHOLD = 3
+    ERROR_BACKOFF_SECONDS = 30
+
     def __init__(self, groq_client):
         self.groq_client = groq_client
         self.active_autonomous_chats = {}  # {group_id: conversation_config}
-        
-        # Trigger patterns for autonomous conversations
-        self.debate_triggers = [
-            r'debate about (.+)', r'argue about (.+)', r'discuss (.+)', 
-            r'what do you think about (.+)', r'(.+) vs (.+)',
-            r'fight about (.+)', r'talk about (.+)'
-        ]
-        
-        self.autonomous_patterns = [
+
+        # Trigger patterns for autonomous conversations. Kept as three
+        # compiled patterns searched in precedence order — a fused
+        # alternation lets the greedy "X vs Y" branch match from position 0
+        # and preempt debate keywords appearing later in the message.
+        self._debate_rx = re.compile(
+            r'(?:debate about|argue about|fight about|talk about|'
+            r'discuss|what do you think about)\s+(?P<topic>.+)',
+            re.IGNORECASE
+        )
+        self._vs_rx = re.compile(
+            r'(?P<vs_left>.+)\s+vs\s+(?P<vs_right>.+)', re.IGNORECASE
+        )
+        self._discussion_rx = re.compile(
+            r'discuss|talk|chat|conversation', re.IGNORECASE
+        )
+
+        self._auto_res = [re.compile(p, re.IGNORECASE) for p in (
             r'let them (.+)', r'start (.+)', r'begin (.+)',
             r'continue (.+)', r'keep (.+)'
-        ]
+        )]
+
+        # Word-bounded so e.g. "stopwatch" doesn't end an autonomous chat
+        self._interrupt_rx = re.compile(
+            r'\b(stop|enough|pause|end|quit|finish)\b', re.IGNORECASE
+        )
+
+        # Sentence terminator, optionally followed by a closing quote/bracket
+        self._sentence_end_rx = re.compile(r'[.!?]["\')\]]?(?:\s|$)')
+
+        # Two-tier LLM response cache: exact prompt hash, then cheap
+        # embedding similarity for near-identical prompts. Embeddings are
+        # stored int8-quantized: 4x smaller than float32, and the cosine
+        # comparison at our threshold is insensitive to the rounding.
+        self._exact_cache = OrderedDict()  # {prompt_sha256: response_text}
+        self._semantic_cache = []  # [(speaker, int8 embedding, norm, response_text)]
+
+        # Single worker so history summarization happens off the turn path
+        self._summary_pool = ThreadPoolExecutor(max_workers=1)
+
+        # Background workers that warm the response cache with the next
+        # (deterministic) debate turn while the UI shows the current one
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Consecutive-failure circuit breaker for the Groq calls
+        self._error_count = 0
+        self._backoff_until = 0.0
+
+    def _note_api_failure(self):
+        """Track consecutive failures and open the backoff window"""
+        self._error_count += 1
+        if self._error_count >= self.ERROR_BACKOFF_THRESHOLD:
+            self._backoff_until = time.time() + self.ERROR_BACKOFF_SECONDS
+
+    def _api_backing_off(self) -> bool:
+        """True while repeated failures have the API call short-circuited"""
+        if self._error_count < self.ERROR_BACKOFF_THRESHOLD:
+            return False
+        if time.time() >= self._backoff_until:
+            self._error_count = 0
+            return False
+        return True
+
+    @staticmethod
+    def _fmt_ts(ts_ns: int) -> str:
+        """Format a time_ns timestamp as an ISO string on demand"""
+        return datetime.fromtimestamp(ts_ns / 1e9).isoformat()
+
+    def _embed_prompt(self, text: str) -> np.ndarray:
+        """Cheap hashed bag-of-words embedding for semantic cache lookups"""
+        vec = np.zeros(self.EMBED_DIM, dtype=np.float32)
+        for token in text.lower().split():
+            vec[hash(token) % self.EMBED_DIM] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @staticmethod
+    def _quantize(embedding: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Quantize a unit embedding to int8 plus its quantized norm"""
+        quantized = np.clip(np.round(embedding * 127.0), -128, 127).astype(np.int8)
+        norm = float(np.linalg.norm(quantized.astype(np.int32)))
+        return quantized, norm
 
-    def detect_autonomous_trigger(self, user_message: str, character_ids: List[str]) -> Optional[Dict]:
+    def _cached_response(self, cache_key: str, embedding: np.ndarray, speaker: str) -> Optional[str]:
+        """Look up a cached response by exact key, then by similarity
+
+        Semantic matches are restricted to the same speaker: two debaters'
+        prompts differ only in the name/personality lines, so their
+        bag-of-words embeddings clear the threshold and an unscoped match
+        would hand one character the other's reply.
+        """
+        cached = self._exact_cache.get(cache_key)
+        if cached is not None:
+            self._exact_cache.move_to_end(cache_key)
+            return cached
+
+        if self._semantic_cache:
+            query, query_norm = self._quantize(embedding)
+            query = query.astype(np.int32)
+            for entry_speaker, vec, norm, response_text in self._semantic_cache:
+                if entry_speaker != speaker:
+                    continue
+                denom = norm * query_norm
+                if denom and float(np.dot(vec.astype(np.int32), query)) / denom > self.SEMANTIC_THRESHOLD:
+                    return response_text
+
+        return None
+
+    def _store_response(self, cache_key: str, embedding: np.ndarray, response_text: str, speaker: str):
+        """Store a generated response in both cache tiers"""
+        self._exact_cache[cache_key] = response_text
+        self._exact_cache.move_to_end(cache_key)
+        if len(self._exact_cache) > self.CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
+
+        quantized, norm = self._quantize(embedding)
+        self._semantic_cache.append((speaker, quantized, norm, response_text))
+        if len(self._semantic_cache) > self.CACHE_SIZE:
+            self._semantic_cache.pop(0)
+
+    def detect_autonomous_trigger(self, user_message: str, character_ids: List[str]) -> Optional[ConversationConfig]:
         """Detect if user wants characters to interact autonomously"""
-        message_lower = user_message.lower().strip()
-        
-        # Check for debate triggers
-        for pattern in self.debate_triggers:
-            match = re.search(pattern, message_lower)
-            if match:
-                topic = match.group(1).strip()
-                return {
-                    'type': 'debate',
-                    'topic': topic,
-                    'participants': character_ids[:2] if len(character_ids) >= 2 else character_ids,
-                    'duration': 'until_stop',
-                    'max_rounds': 8,
-                    'current_round': 0
-                }
-        
-        # Check for general discussion triggers
-        discussion_keywords = ['discuss', 'talk', 'chat', 'conversation']
-        if any(keyword in message_lower for keyword in discussion_keywords):
-            return {
-                'type': 'discussion',
-                'topic': user_message,
-                'participants': character_ids,
-                'duration': 'until_stop',
-                'max_rounds': 6,
-                'current_round': 0
-            }
-        
+        user_message = user_message.strip()
+
+        # Explicit debate triggers anywhere in the message win over the
+        # "X vs Y" form, which wins over bare discussion keywords
+        match = self._debate_rx.search(user_message)
+        if match:
+            topic = match.group('topic').strip()
+        else:
+            vs_match = self._vs_rx.search(user_message)
+            topic = vs_match.group('vs_left').strip() if vs_match else None
+
+        if topic is not None:
+            return ConversationConfig(
+                type='debate',
+                topic=topic,
+                participants=character_ids[:2] if len(character_ids) >= 2 else character_ids,
+                max_rounds=8
+            )
+
+        # Bare discussion keyword without a debate-style topic
+        if self._discussion_rx.search(user_message):
+            return ConversationConfig(
+                type='discussion',
+                topic=user_message,
+                participants=character_ids,
+                max_rounds=6
+            )
+
         return None
 
-    def start_autonomous_conversation(self, conversation_config: Dict, group_id: str):
+    def start_autonomous_conversation(self, conversation_config: ConversationConfig, group_id: str):
         """Start an autonomous conversation between characters"""
-        conversation_config['started_at'] = datetime.now().isoformat()
-        conversation_config['last_speaker'] = None
-        conversation_config['conversation_history'] = []
-        
+        conversation_config.started_at_ns = time.time_ns()
+        conversation_config.last_speaker = None
+        # Bounded so long-running chats can't grow memory without limit
+        conversation_config.conversation_history = deque(maxlen=HISTORY_CAP)
+
+        # Pre-shuffled round-robin order for discussion speaker selection
+        participants = conversation_config.participants
+        conversation_config.speaker_cycle = random.sample(participants, len(participants))
+        conversation_config.speaker_idx = 0
+
         self.active_autonomous_chats[group_id] = conversation_config
 
     def generate_autonomous_response(self, group_id: str, character_database: Dict) -> List[Dict]:
@@ -74,31 +276,39 @@ class ConversationOrchestrator:
             return [{
                 'character_id': 'system',
                 'character_name': 'System',
-                'response': f"🏁 {config['type'].title()} concluded after {config['current_round']} rounds!"
+                'response': f"🏁 {config.type.title()} concluded after {config.half_rounds // 2} rounds!"
             }]
-        
+
         # Determine next speaker
         next_speaker_id = self.select_next_speaker(config)
         if not next_speaker_id or next_speaker_id not in character_database:
             return []
-        
+
         character = character_database[next_speaker_id]
-        
+
         # Generate response
         response_text = self.generate_character_autonomous_response(
             character, config, character_database
         )
-        
+
         if response_text:
             # Update conversation state
-            config['last_speaker'] = next_speaker_id
-            config['current_round'] += 0.5  # Each response is half a round
-            config['conversation_history'].append({
+            config.last_speaker = next_speaker_id
+            config.half_rounds += 1
+            config.conversation_history.append({
                 'speaker': next_speaker_id,
                 'response': response_text,
-                'timestamp': datetime.now().isoformat()
+                'ts_ns': time.time_ns(),
+                '_lhash': hash(response_text.lower())
             })
-            
+            self._maybe_summarize(config)
+
+            # Debate turn order is deterministic, so generate the opponent's
+            # reply in the background; the next tick then hits the exact
+            # cache instead of waiting on a fresh round-trip
+            if config.type == 'debate':
+                self._prefetch_pool.submit(self._prefetch_next_turn, config, character_database)
+
             return [{
                 'character_id': next_speaker_id,
                 'character_name': character['name'],
@@ -108,115 +318,356 @@ class ConversationOrchestrator:
         
         return []
 
-    def select_next_speaker(self, config: Dict) -> Optional[str]:
-        """Select who should speak next in autonomous conversation"""
-        participants = config['participants']
-        last_speaker = config.get('last_speaker')
-        
-        if not last_speaker:
-            # First response - pick randomly or first character
-            return participants[0] if participants else None
-        
-        if config['type'] == 'debate':
-            # Alternate between participants in debate
-            try:
-                current_index = participants.index(last_speaker)
-                next_index = (current_index + 1) % len(participants)
-                return participants[next_index]
-            except ValueError:
-                return participants[0]
-        
-        elif config['type'] == 'discussion':
-            # More natural selection for discussions
-            available_speakers = [p for p in participants if p != last_speaker]
-            return random.choice(available_speakers) if available_speakers else participants[0]
-        
-        return participants[0]
+    def _prefetch_next_turn(self, config: ConversationConfig, character_database: Dict):
+        """Warm the response cache with the next debate speaker's turn"""
+        try:
+            participants = config.participants
+            if not participants or config.last_speaker not in participants:
+                return
+            next_id = participants[(participants.index(config.last_speaker) + 1) % len(participants)]
+            character = character_database.get(next_id)
+            if character and not self.should_end_conversation(config):
+                self.generate_character_autonomous_response(character, config, character_database)
+        except Exception:
+            logger.exception("Error prefetching next autonomous turn")
 
-    def generate_character_autonomous_response(self, character: Dict, config: Dict, character_database: Dict) -> str:
-        """Generate character response for autonomous conversation"""
+    def _maybe_summarize(self, config: ConversationConfig):
+        """Fold turns leaving the verbatim window into the running summary"""
+        history = config.conversation_history
+        if len(history) > self.VERBATIM_TURNS + 2:
+            old_turns = [history.popleft() for _ in range(len(history) - self.VERBATIM_TURNS)]
+            self._summary_pool.submit(self._summarize_old_turns, config, old_turns)
+
+    def _summarize_old_turns(self, config: ConversationConfig, old_turns: List[Dict]):
+        """Condense evicted turns into config.summary via a cheap LLM call"""
+        turns_text = "\n".join(f"{t['speaker']}: {t['response']}" for t in old_turns)
         try:
-            # Build context about other participants
-            other_participants = []
-            for char_id in config['participants']:
-                if char_id != character.get('name', '').lower().replace(' ', '_'):
-                    if char_id in character_database:
-                        other_participants.append(character_database[char_id]['name'])
-            
-            # Get recent conversation history
-            recent_history = config.get('conversation_history', [])[-4:]
-            history_text = ""
-            if recent_history:
-                history_text = "\nRecent conversation:\n"
-                for entry in recent_history:
-                    speaker_name = "You" if entry['speaker'] == character.get('name', '').lower().replace(' ', '_') else entry['speaker']
-                    history_text += f"{speaker_name}: {entry['response']}\n"
-            
-            # Create conversation-type specific prompt
-            if config['type'] == 'debate':
-                prompt = f"""You are {character['name']} in an autonomous debate about "{config['topic']}" with {', '.join(other_participants)}.
+            prompt = f"""Condense this conversation about "{config.topic}" into a 2-3 sentence summary of the key points made so far.
 
-Your personality: {character.get('personality', 'Engaging debater')}
-Your speaking style: {character.get('speaking_style', 'Confident and clear')}
+Existing summary: {config.summary or 'None'}
 
-{history_text}
+New turns:
+{turns_text}
 
-This is round {int(config['current_round'] + 1)} of the debate. Present your argument passionately but respectfully. 
-Be specific, use examples, and try to counter previous points if relevant.
-Respond in 1-2 sentences that show your character's unique perspective.
+Summary:"""
 
-Your response:"""
+            response = self.groq_client.chat.completions.create(
+                model="llama3-70b-8192",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=120,
+                temperature=0.3
+            )
+
+            if response and response.choices:
+                config.summary = response.choices[0].message.content.strip()
+                return
+
+        except Exception:
+            logger.exception("Error summarizing conversation history")
+
+        # Keep at least a rough record of what was evicted
+        config.summary = f"{config.summary}\n{turns_text}".strip()[-600:]
+
+    def generate_autonomous_round(self, group_id: str, character_database: Dict) -> List[Dict]:
+        """Generate a full debate round (both speakers) from one API call"""
+        if group_id not in self.active_autonomous_chats:
+            return []
+
+        config = self.active_autonomous_chats[group_id]
+
+        # Discussions pick speakers stochastically - keep the one-turn path
+        if config.type != 'debate':
+            return self.generate_autonomous_response(group_id, character_database)
+
+        if self.should_end_conversation(config):
+            self.end_autonomous_conversation(group_id)
+            return [{
+                'character_id': 'system',
+                'character_name': 'System',
+                'response': f"🏁 {config.type.title()} concluded after {config.half_rounds // 2} rounds!"
+            }]
+
+        # A debate round is the next speaker plus their opponent
+        participants = config.participants
+        first_id = self.select_next_speaker(config)
+        if len(participants) < 2 or first_id not in character_database:
+            return self.generate_autonomous_response(group_id, character_database)
+
+        second_id = participants[(participants.index(first_id) + 1) % len(participants)]
+        if second_id not in character_database:
+            return self.generate_autonomous_response(group_id, character_database)
+
+        turns = self.generate_debate_round_responses(
+            [character_database[first_id], character_database[second_id]], config
+        )
+        if not turns:
+            # Batched call failed - fall back to the single-turn path
+            return self.generate_autonomous_response(group_id, character_database)
+
+        responses = []
+        for char_id, character, response_text in zip([first_id, second_id],
+                                                     [character_database[first_id], character_database[second_id]],
+                                                     turns):
+            config.last_speaker = char_id
+            config.half_rounds += 1
+            config.conversation_history.append({
+                'speaker': char_id,
+                'response': response_text,
+                'ts_ns': time.time_ns(),
+                '_lhash': hash(response_text.lower())
+            })
+            responses.append({
+                'character_id': char_id,
+                'character_name': character['name'],
+                'response': response_text,
+                'autonomous': True
+            })
+
+        self._maybe_summarize(config)
+        return responses
+
+    def generate_debate_round_responses(self, characters: List[Dict], config: ConversationConfig) -> List[str]:
+        """Ask the model for both debate turns in a single request"""
+        try:
+            # Recent history for context
+            recent_history = list(config.conversation_history)[-4:]
+            history_text = ""
+            if config.summary:
+                history_text = f"\nSummary so far: {config.summary}\n"
+            if recent_history:
+                history_text += "\nRecent conversation:\n"
+                for entry in recent_history:
+                    history_text += f"{entry['speaker']}: {entry['response']}\n"
 
-            else:  # discussion
-                prompt = f"""You are {character['name']} in an autonomous discussion about "{config['topic']}" with {', '.join(other_participants)}.
+            profiles = "\n".join(
+                f"- {c['name']}: personality: {c.get('personality', 'Engaging debater')}; "
+                f"speaking style: {c.get('speaking_style', 'Confident and clear')}"
+                for c in characters
+            )
 
-Your personality: {character.get('personality', 'Thoughtful conversationalist')}
-Your speaking style: {character.get('speaking_style', 'Natural and engaging')}
+            prompt = f"""Two characters are debating "{config.topic}":
+{profiles}
 
 {history_text}
 
-Continue the discussion naturally. Share your thoughts, ask questions, or respond to what others have said.
-Stay true to your character while keeping the conversation flowing.
-Respond in 1-2 sentences.
+This is round {config.half_rounds // 2 + 1} of the debate. {characters[0]['name']} speaks first, then {characters[1]['name']} responds.
+Each argument should be passionate but respectful, specific, and 1-2 sentences in that character's voice.
 
-Your response:"""
+Respond ONLY with a JSON array of two strings: [{characters[0]['name']}'s argument, {characters[1]['name']}'s argument]"""
 
-            # Generate response using Groq
             response = self.groq_client.chat.completions.create(
                 model="llama3-70b-8192",
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
+                max_tokens=300,
                 temperature=0.8
             )
-            
+
             if response and response.choices:
-                response_text = response.choices[0].message.content.strip()
-                
+                content = response.choices[0].message.content.strip()
+                # Tolerate prose around the JSON array
+                match = re.search(r'\[.*\]', content, re.DOTALL)
+                if match:
+                    turns = json.loads(match.group(0))
+                    if isinstance(turns, list) and len(turns) >= 2:
+                        return [str(t).strip() for t in turns[:2]]
+
+        except Exception:
+            logger.exception("Error generating debate round")
+            self._note_api_failure()
+
+        return []
+
+    def tick_all_groups(self, character_database: Dict) -> Dict[str, List[Dict]]:
+        """Advance every active autonomous conversation concurrently
+
+        Each turn is I/O-bound on the Groq round-trip, so running the
+        groups in a thread pool makes a tick cost roughly the slowest
+        single call instead of the sum of all of them.
+        """
+        group_ids = list(self.active_autonomous_chats)
+        if not group_ids:
+            return {}
+
+        if len(group_ids) == 1:
+            return {group_ids[0]: self.generate_autonomous_response(group_ids[0], character_database)}
+
+        with ThreadPoolExecutor(max_workers=min(len(group_ids), 8)) as pool:
+            results = pool.map(
+                lambda gid: self.generate_autonomous_response(gid, character_database),
+                group_ids
+            )
+            return dict(zip(group_ids, results))
+
+    def select_next_speaker(self, config: ConversationConfig) -> Optional[str]:
+        """Select who should speak next in autonomous conversation"""
+        participants = config.participants
+        last_speaker = config.last_speaker
+
+        if not last_speaker:
+            # First response - pick randomly or first character
+            return participants[0] if participants else None
+
+        if config.type == 'debate':
+            # Alternate between participants; cache the index so we only
+            # pay the O(N) list scan when the cached value goes stale
+            last_index = config.last_idx
+            if last_index is None or participants[last_index] != last_speaker:
+                try:
+                    last_index = participants.index(last_speaker)
+                except ValueError:
+                    config.last_idx = 0
+                    return participants[0]
+            next_index = (last_index + 1) % len(participants)
+            config.last_idx = next_index
+            return participants[next_index]
+
+        elif config.type == 'discussion':
+            # Walk the pre-shuffled cycle instead of re-rolling the PRNG
+            # and rebuilding a candidate list every turn
+            cycle = config.speaker_cycle
+            if not cycle:
+                cycle = random.sample(participants, len(participants))
+                config.speaker_cycle = cycle
+                config.speaker_idx = 0
+
+            index = config.speaker_idx
+            speaker = cycle[index % len(cycle)]
+            if speaker == last_speaker and len(cycle) > 1:
+                index += 1
+                speaker = cycle[index % len(cycle)]
+            config.speaker_idx = index + 1
+            return speaker
+
+        return participants[0]
+
+    def generate_character_autonomous_response(self, character: Dict, config: ConversationConfig, character_database: Dict) -> str:
+        """Generate character response for autonomous conversation"""
+        # Don't bother building a prompt while the API is known to be down
+        if self._api_backing_off():
+            return f"*{character['name']} is thinking about {config.topic}...*"
+
+        try:
+            # Normalize the character name to its database id once; it's
+            # compared against every participant and history entry below
+            self_char_id = character.get('name', '').lower().replace(' ', '_')
+
+            # The prompt header (identity, topic, participants, personality)
+            # is invariant for the life of the conversation, so build it once
+            # per character and only render the dynamic tail each turn.
+            # Keeping the static text at the head also makes the prompt
+            # friendly to provider-side prompt caching.
+            prefix_cache = config.prompt_prefix
+            prefix = prefix_cache.get(character['name'])
+            if prefix is None:
+                # Joined names of the other participants are fixed for the
+                # conversation, so compute them once per character viewpoint
+                others = config.others_strs.get(self_char_id)
+                if others is None:
+                    others = ', '.join(
+                        character_database[char_id]['name']
+                        for char_id in config.participants
+                        if char_id != self_char_id and char_id in character_database
+                    )
+                    config.others_strs[self_char_id] = others
+
+                if config.type == 'debate':
+                    prefix = _DEBATE_PREFIX_TEMPLATE.format_map({
+                        'name': character['name'],
+                        'topic': config.topic,
+                        'others': others,
+                        'personality': character.get('personality', 'Engaging debater'),
+                        'speaking_style': character.get('speaking_style', 'Confident and clear')
+                    })
+                else:  # discussion
+                    prefix = _DISCUSSION_PREFIX_TEMPLATE.format_map({
+                        'name': character['name'],
+                        'topic': config.topic,
+                        'others': others,
+                        'personality': character.get('personality', 'Thoughtful conversationalist'),
+                        'speaking_style': character.get('speaking_style', 'Natural and engaging')
+                    })
+                prefix_cache[character['name']] = prefix
+
+            # Get recent conversation history (deque doesn't slice directly)
+            recent_history = list(config.conversation_history)[-4:]
+            history_text = ""
+            if config.summary:
+                history_text = f"\nSummary so far: {config.summary}\n"
+            if recent_history:
+                history_text += "\nRecent conversation:\n"
+                for entry in recent_history:
+                    speaker_name = "You" if entry['speaker'] == self_char_id else entry['speaker']
+                    history_text += f"{speaker_name}: {entry['response']}\n"
+
+            # Dynamic tail: recent history plus per-round instructions
+            turn_template = _DEBATE_TURN_TEMPLATE if config.type == 'debate' else _DISCUSSION_TURN_TEMPLATE
+            prompt = turn_template.format_map({
+                'prefix': prefix,
+                'history_text': history_text,
+                'round': config.half_rounds // 2 + 1
+            })
+
+            # Check the response cache before paying for a Groq round-trip
+            cache_key = hashlib.sha256(prompt.encode()).hexdigest()
+            embedding = self._embed_prompt(prompt)
+            cached = self._cached_response(cache_key, embedding, character['name'])
+            if cached is not None:
+                return cached
+
+            # Stream the response and stop once two sentences have landed;
+            # the prompt asks for 1-2 sentences, so waiting out the full
+            # token budget just adds latency and billed tokens
+            stream = self.groq_client.chat.completions.create(
+                model="llama3-70b-8192",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=80,
+                temperature=0.8,
+                stream=True
+            )
+
+            response_text = ""
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                response_text += delta
+                if len(self._sentence_end_rx.findall(response_text)) >= 2:
+                    stream.close()
+                    break
+
+            response_text = response_text.strip()
+            if response_text:
                 # Clean up response
                 if response_text.startswith('"') and response_text.endswith('"'):
                     response_text = response_text[1:-1]
-                
+
+                self._store_response(cache_key, embedding, response_text, character['name'])
+                self._error_count = 0
                 return response_text
             
-        except Exception as e:
-            print(f"Error generating autonomous response: {e}")
+        except Exception:
+            logger.exception("Error generating autonomous response")
+            self._note_api_failure()
         
         # Fallback response
-        return f"*{character['name']} is thinking about {config['topic']}...*"
+        return f"*{character['name']} is thinking about {config.topic}...*"
 
-    def should_end_conversation(self, config: Dict) -> bool:
+    def should_end_conversation(self, config: ConversationConfig) -> bool:
         """Determine if autonomous conversation should end"""
         # End if max rounds reached
-        if config['current_round'] >= config.get('max_rounds', 6):
+        if config.half_rounds >= config.max_rounds * 2:
             return True
-        
+
         # End if conversation is getting repetitive
-        recent_responses = config.get('conversation_history', [])[-4:]
+        recent_responses = list(config.conversation_history)[-4:]
         if len(recent_responses) >= 4:
-            # Simple repetition check
-            response_texts = [r['response'].lower() for r in recent_responses]
-            unique_responses = set(response_texts)
-            if len(unique_responses) < len(response_texts) * 0.7:  # Too much repetition
+            # Simple repetition check over hashes precomputed at append
+            # time, so the same strings aren't re-lowercased on every tick
+            response_hashes = [
+                r.get('_lhash', hash(r['response'].lower())) for r in recent_responses
+            ]
+            unique_responses = set(response_hashes)
+            if len(unique_responses) < len(response_hashes) * 0.7:  # Too much repetition
                 return True
         
         return False
@@ -230,16 +681,14 @@ Your response:"""
         """Check if autonomous conversation is active for group"""
         return group_id in self.active_autonomous_chats
 
-    def get_autonomous_status(self, group_id: str) -> Optional[Dict]:
+    def get_autonomous_status(self, group_id: str) -> Optional[ConversationConfig]:
         """Get current autonomous conversation status"""
         return self.active_autonomous_chats.get(group_id)
 
     def handle_user_interruption(self, user_message: str, group_id: str) -> bool:
         """Handle user interruption of autonomous chat"""
-        interruption_keywords = ['stop', 'enough', 'pause', 'end', 'quit', 'finish']
-        
-        if any(keyword in user_message.lower() for keyword in interruption_keywords):
+        if self._interrupt_rx.search(user_message):
             self.end_autonomous_conversation(group_id)
             return True
-        
+
         return False
\ No newline at end of file
@@ -1,7 +1,21 @@
 import re
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Tuple
 
+# Fused word-class alternations for message typing: one compiled scan
+# per class instead of a Python-level any() over substrings
+_QUESTION_RE = re.compile(r'\?|what|how|why|where|when|who')
+_REQUEST_RE = re.compile(r'tell|explain|describe|show')
+_DEBATE_RE = re.compile(r'debate|argue|discuss|fight')
+
+# Word tokenizer for relevance scoring
+_WORD_RE = re.compile(r'\w+')
+
 class SmartCharacterSelector:
     def __init__(self, groq_client):
         self.groq_client = groq_client
@@ -13,19 +27,79 @@ class SmartCharacterSelector:
             'introduce yourselves', 'how are you all', 'what are your thoughts'
         ]
         
-        # Greeting patterns that usually get group responses
+        # Greeting patterns that usually get group responses, compiled
+        # once here instead of re-parsed on every message
         self.greeting_patterns = [
-            r'^(hi|hello|hey|greetings?)(?:\s+(?:everyone|all|guys|team))?[!.]?$',
-            r'^good\s+(morning|afternoon|evening|day)(?:\s+(?:everyone|all))?[!.]?$',
-            r'^what\'?s\s+up(?:\s+(?:everyone|all|guys))?[!.]?$'
+            re.compile(r'^(hi|hello|hey|greetings?)(?:\s+(?:everyone|all|guys|team))?[!.]?$'),
+            re.compile(r'^good\s+(morning|afternoon|evening|day)(?:\s+(?:everyone|all))?[!.]?$'),
+            re.compile(r'^what\'?s\s+up(?:\s+(?:everyone|all|guys))?[!.]?$')
         ]
+        
+        # First tokens that can open any greeting pattern; an O(1) gate
+        # that lets non-greetings (the common case) skip the regex list
+        self._greeting_first_tokens = frozenset(
+            ('hi', 'hello', 'hey', 'greeting', 'greetings', 'good', "what's", 'whats')
+        )
+        
+        # Question patterns that suggest a group response
+        self.group_question_patterns = [
+            re.compile(r'what do you (all )?think'),
+            re.compile(r'what are your (thoughts|opinions)'),
+            re.compile(r'how do you (all )?feel'),
+            re.compile(r'tell me about yourselves'),
+            re.compile(r'introduce yourselves'),
+            re.compile(r'what can you (all )?do')
+        ]
+        
+        # Combined mention regex per group of character ids, compiled
+        # lazily so each group pays the build cost once
+        self._mention_re_cache = {}
+        
+        # Lowercase name -> character id per group, for O(1) resolution
+        # of AI-suggested target names
+        self._name_index_cache = {}
+        # Per-roster member names and static prompt prefix, so the AI
+        # fallback rebuilds neither on every call (a stable prefix also
+        # lets the provider reuse its prompt cache across messages)
+        self._roster_cache = {}
+        
+        # Single-word indicators become a frozenset matched against
+        # whole tokens, so 'all' no longer fires inside words like
+        # 'tall' or 'ball'; multi-word phrases keep the fused
+        # single-scan alternation
+        self._single_word_group_indicators = frozenset(
+            ind for ind in self.group_message_indicators if ' ' not in ind
+        )
+        self._group_indicator_re = re.compile(
+            '|'.join(
+                re.escape(indicator)
+                for indicator in self.group_message_indicators
+                if ' ' in indicator
+            )
+        )
+        
+        # Exact-match LRU cache for AI intent analyses; repeated probes
+        # ("hi", "what do you think") are the norm in chat, and each
+        # miss is a full llama3-70b round trip
+        self._ai_cache: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._ai_cache_max = 1024
+        self._ai_cache_ttl = 3600.0
+        
+        # Coalesce concurrent identical analyses: duplicate in-flight
+        # prompts attach to the same Future instead of each paying for
+        # their own LLM call
+        self._inflight: "Dict[str, Future]" = {}
+        self._inflight_lock = threading.Lock()
+        self._analysis_pool = ThreadPoolExecutor(max_workers=2)
 
     def analyze_message_intent(self, user_message: str, character_ids: List[str], character_database: Dict) -> Dict:
         """Analyze user message to determine targeting and intent"""
         message_lower = user_message.lower().strip()
         
-        # Detect direct character mentions
-        mentioned_characters = self.detect_character_mentions(user_message, character_ids, character_database)
+        # Detect direct character mentions (reusing the one lowercase copy)
+        mentioned_characters = self.detect_character_mentions(
+            user_message, character_ids, character_database, message_lower
+        )
         
         # Detect if it's a group-directed message
         is_group_message = self.is_group_directed_message(message_lower)
@@ -33,118 +107,208 @@ class SmartCharacterSelector:
         # Detect greeting patterns
         is_greeting = self.is_greeting_message(message_lower)
         
-        # Use AI analysis for complex messages
-        ai_analysis = self.get_ai_intent_analysis(user_message, character_ids, character_database)
+        # Use AI analysis only when the rule tiers were inconclusive;
+        # select_responding_characters ignores the AI result whenever a
+        # mention, greeting or group cue already decided, so calling the
+        # 70B model there would be paid-for work that gets discarded
+        if mentioned_characters or is_group_message or is_greeting:
+            ai_analysis = None
+        else:
+            ai_analysis = self.get_ai_intent_analysis(
+                user_message, character_ids, character_database, message_lower
+            )
         
         return {
             'mentioned_characters': mentioned_characters,
             'is_group_message': is_group_message,
             'is_greeting': is_greeting,
             'ai_analysis': ai_analysis,
-            'message_type': self.determine_message_type(message_lower),
+            'message_type': self.determine_message_type(message_lower, is_greeting),
             'confidence': self.calculate_confidence(mentioned_characters, is_group_message, is_greeting)
         }
 
-    def detect_character_mentions(self, user_message: str, character_ids: List[str], character_database: Dict) -> List[str]:
-        """Detect direct character mentions in the message"""
-        mentioned = []
-        message_lower = user_message.lower()
-        
-        for char_id in character_ids:
-            if char_id in character_database:
-                char_name = character_database[char_id]['name'].lower()
-                
-                # Direct name mentions
-                if char_name in message_lower:
-                    mentioned.append(char_id)
-                    continue
-                
-                # @mentions
-                if f"@{char_name}" in message_lower:
-                    mentioned.append(char_id)
-                    continue
-                
-                # "Hey [character]" patterns
-                if re.search(rf'\b(hey|hi|hello)\s+{re.escape(char_name)}\b', message_lower):
-                    mentioned.append(char_id)
-                    continue
-                
-                # "[character], what do you think" patterns
-                if re.search(rf'\b{re.escape(char_name)},?\s+(what|how|why|where|when)', message_lower):
-                    mentioned.append(char_id)
-                    continue
-                
-                # Question directed at character
-                if re.search(rf'{re.escape(char_name)}\s+(what|how|do\s+you|are\s+you|can\s+you)', message_lower):
-                    mentioned.append(char_id)
-                    continue
-        
-        return mentioned
+    def _name_index(self, character_ids: tuple, character_database: Dict) -> Dict[str, str]:
+        """Lowercase name -> character id for a group, built once"""
+        index = self._name_index_cache.get(character_ids)
+        if index is None:
+            index = self._name_index_cache[character_ids] = {
+                character_database[char_id]['name'].lower(): char_id
+                for char_id in character_ids
+                if char_id in character_database
+            }
+        return index
+
+    def _combined_mention_re(self, character_ids: tuple, character_database: Dict):
+        """Compiled alternation over a group's character names
+
+        Returns (pattern, group -> char_id map, nested char_ids). The
+        alternation lists longer names first so "naruto uzumaki" wins
+        over "naruto" at the same position; names contained inside a
+        longer group name are collected separately since leftmost
+        matching can swallow them, and only those few get a direct
+        substring check at scan time.
+        """
+        cached = self._mention_re_cache.get(character_ids)
+        if cached is None:
+            names = {
+                char_id: character_database[char_id]['name'].lower()
+                for char_id in character_ids
+                if char_id in character_database
+            }
+            nested = {
+                char_id: name for char_id, name in names.items()
+                if any(name != other and name in other for other in names.values())
+            }
+            pattern = None
+            id_by_group = {}
+            if names:
+                parts = []
+                ordered = sorted(names.items(), key=lambda kv: -len(kv[1]))
+                for i, (char_id, name) in enumerate(ordered):
+                    id_by_group[f'c{i}'] = char_id
+                    parts.append(f'(?P<c{i}>{re.escape(name)})')
+                # Callers scan the lowercase message, so no IGNORECASE cost
+                pattern = re.compile('|'.join(parts))
+            cached = self._mention_re_cache[character_ids] = (pattern, id_by_group, nested)
+        return cached
+
+    def detect_character_mentions(self, user_message: str, character_ids: List[str], character_database: Dict, message_lower: str = None) -> List[str]:
+        """Detect direct character mentions in the message
+
+        Every per-character mention pattern required the name itself to
+        appear, so one alternation scan over the group's names finds the
+        same mentions as the old one-pass-per-character loop, in time
+        independent of the character count. Callers that already hold a
+        lowercase copy of the message pass it in to skip the re-lower.
+        """
+        if message_lower is None:
+            message_lower = user_message.lower()
+        
+        pattern, id_by_group, nested = self._combined_mention_re(
+            tuple(character_ids), character_database
+        )
+        if pattern is None:
+            return []
+        
+        seen = {id_by_group[m.lastgroup] for m in pattern.finditer(message_lower)}
+        
+        # Names nested inside a longer member's name can be swallowed by
+        # leftmost matching; confirm just those with a substring check
+        seen.update(
+            cid for cid, name in nested.items()
+            if cid not in seen and name in message_lower
+        )
+        
+        return [char_id for char_id in character_ids if char_id in seen]
 
     def is_group_directed_message(self, message_lower: str) -> bool:
         """Check if message is directed at the group"""
-        # Direct group indicators
-        if any(indicator in message_lower for indicator in self.group_message_indicators):
+        # Single-word indicators, matched on word boundaries
+        if not self._single_word_group_indicators.isdisjoint(_WORD_RE.findall(message_lower)):
             return True
         
-        # Question patterns that suggest group response
-        group_question_patterns = [
-            r'what do you (all )?think',
-            r'what are your (thoughts|opinions)',
-            r'how do you (all )?feel',
-            r'tell me about yourselves',
-            r'introduce yourselves',
-            r'what can you (all )?do'
-        ]
+        # Multi-word indicator phrases
+        if self._group_indicator_re.search(message_lower):
+            return True
         
-        return any(re.search(pattern, message_lower) for pattern in group_question_patterns)
+        # Question patterns that suggest group response
+        return any(pattern.search(message_lower) for pattern in self.group_question_patterns)
 
     def is_greeting_message(self, message_lower: str) -> bool:
         """Check if message is a greeting that should get group response"""
-        return any(re.match(pattern, message_lower) for pattern in self.greeting_patterns)
+        # Cheap first-token dispatch before any regex runs
+        words = message_lower.split(None, 1)
+        if not words or words[0].rstrip('!.') not in self._greeting_first_tokens:
+            return False
+        return any(pattern.match(message_lower) for pattern in self.greeting_patterns)
 
-    def get_ai_intent_analysis(self, user_message: str, character_ids: List[str], character_database: Dict) -> Dict:
-        """Use AI to analyze complex message intent"""
-        try:
-            # Build character context
-            char_names = []
-            for char_id in character_ids:
-                if char_id in character_database:
-                    char_names.append(character_database[char_id]['name'])
-            
-            analysis_prompt = f"""
-Analyze this user message in a group chat context and determine who should respond.
+    def _roster(self, character_ids: tuple, character_database: Dict) -> Tuple[List[str], str]:
+        """Cached (member names, static prompt prefix) for a roster"""
+        entry = self._roster_cache.get(character_ids)
+        if entry is None:
+            char_names = [
+                character_database[char_id]['name']
+                for char_id in character_ids
+                if char_id in character_database
+            ]
+            prefix = f"""
+Decide who should respond to this group chat message.
 
 Group members: {', '.join(char_names)}
-User message: "{user_message}"
+User message: """
+            entry = self._roster_cache[character_ids] = (char_names, prefix)
+        return entry
 
-Consider:
-1. Is the message directed at specific characters?
-2. Is it a general question for everyone?
-3. Is it a greeting or casual remark?
-4. Does it require expertise from specific characters?
+    def get_ai_intent_analysis(self, user_message: str, character_ids: List[str], character_database: Dict, message_lower: str = None) -> Dict:
+        """Use AI to analyze complex message intent, memoized per prompt"""
+        if message_lower is None:
+            message_lower = user_message.lower()
+        
+        char_names, prompt_prefix = self._roster(tuple(character_ids), character_database)
+        
+        cache_key = hashlib.sha256(json.dumps(
+            {"chars": sorted(char_names), "msg": message_lower.strip()},
+            sort_keys=True
+        ).encode()).hexdigest()
+        
+        cached = self._ai_cache.get(cache_key)
+        if cached is not None:
+            analysis, stored_at = cached
+            if time.time() - stored_at < self._ai_cache_ttl:
+                self._ai_cache.move_to_end(cache_key)
+                return analysis
+            del self._ai_cache[cache_key]
+        
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = self._inflight[cache_key] = self._analysis_pool.submit(
+                    self._run_ai_intent_analysis, cache_key, user_message,
+                    char_names, prompt_prefix
+                )
+        try:
+            return future.result()
+        finally:
+            if owner:
+                with self._inflight_lock:
+                    self._inflight.pop(cache_key, None)
+
+    def _run_ai_intent_analysis(self, cache_key: str, user_message: str, char_names: List[str], prompt_prefix: str) -> Dict:
+        """Issue one intent-analysis LLM call (runs on a worker thread)"""
+        try:
+            analysis_prompt = prompt_prefix + f'"{user_message}"' + """
 
-Respond with JSON format:
-{{
-    "target_type": "specific|group|general",
-    "target_characters": ["character_name1", "character_name2"],
-    "reasoning": "explanation of why these characters should respond",
-    "response_count": 1-3
-}}
+Reply with a JSON object with these fields:
+- "target_type": "specific", "group" or "general"
+- "target_characters": list of member names who should respond
+- "reasoning": one short sentence
+- "response_count": integer from 1 to 3
 """
 
+            # JSON mode constrains the model to valid JSON, so the
+            # parse-failure path (which wasted the whole call) is gone
+            # and the tighter schema fits in fewer tokens
             response = self.groq_client.chat.completions.create(
                 model="llama3-70b-8192",
                 messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=200,
-                temperature=0.3
+                max_tokens=120,
+                temperature=0.3,
+                response_format={"type": "json_object"}
             )
             
             if response and response.choices:
                 try:
-                    return json.loads(response.choices[0].message.content)
+                    analysis = json.loads(response.choices[0].message.content)
                 except json.JSONDecodeError:
+                    # Don't cache unparseable replies; a retry may succeed
                     pass
+                else:
+                    if isinstance(analysis.get('target_characters'), list):
+                        self._ai_cache[cache_key] = (analysis, time.time())
+                        if len(self._ai_cache) > self._ai_cache_max:
+                            self._ai_cache.popitem(last=False)
+                        return analysis
         
         except Exception as e:
             print(f"AI analysis error: {e}")
@@ -157,33 +321,36 @@ Respond with JSON format:
             "response_count": 1
         }
 
-    def determine_message_type(self, message_lower: str) -> str:
-        """Determine the type of message"""
-        if any(re.match(pattern, message_lower) for pattern in self.greeting_patterns):
+    def determine_message_type(self, message_lower: str, is_greeting: bool) -> str:
+        """Determine the type of message
+
+        The caller has already run the greeting scan, so the result is
+        passed in instead of matching the same patterns a second time.
+        """
+        if is_greeting:
             return "greeting"
-        elif any(word in message_lower for word in ['?', 'what', 'how', 'why', 'where', 'when', 'who']):
+        elif _QUESTION_RE.search(message_lower):
             return "question"
-        elif any(word in message_lower for word in ['tell', 'explain', 'describe', 'show']):
+        elif _REQUEST_RE.search(message_lower):
             return "request"
-        elif any(word in message_lower for word in ['debate', 'argue', 'discuss', 'fight']):
+        elif _DEBATE_RE.search(message_lower):
             return "debate_trigger"
         else:
             return "statement"
 
     def calculate_confidence(self, mentioned_characters: List[str], is_group_message: bool, is_greeting: bool) -> float:
-        """Calculate confidence in character selection"""
-        confidence = 0.5  # Base confidence
-        
-        if mentioned_characters:
-            confidence += 0.4  # High confidence if characters mentioned
-        
-        if is_group_message:
-            confidence += 0.3
-        
-        if is_greeting:
-            confidence += 0.2
-        
-        return min(confidence, 1.0)
+        """Calculate confidence in character selection
+
+        Branchless: 0.5 base plus weighted signals (mentions weigh the
+        most), capped at 1.0.
+        """
+        return min(
+            0.5
+            + 0.4 * bool(mentioned_characters)
+            + 0.3 * is_group_message
+            + 0.2 * is_greeting,
+            1.0
+        )
 
     def select_responding_characters(self, intent_analysis: Dict, character_ids: List[str], character_database: Dict) -> List[str]:
         """Select which characters should respond based on intent analysis"""
@@ -207,13 +374,12 @@ Respond with JSON format:
         
         # Priority 4: AI analysis recommendations
         if ai_analysis and ai_analysis.get('target_characters'):
+            name_index = self._name_index(tuple(character_ids), character_database)
             ai_targets = []
             for target_name in ai_analysis['target_characters']:
-                for char_id in character_ids:
-                    if char_id in character_database:
-                        if character_database[char_id]['name'].lower() == target_name.lower():
-                            ai_targets.append(char_id)
-                            break
+                char_id = name_index.get(target_name.lower())
+                if char_id:
+                    ai_targets.append(char_id)
             if ai_targets:
                 return ai_targets[:ai_analysis.get('response_count', 2)]
         
@@ -239,21 +405,30 @@ Respond with JSON format:
         if char_id in message_context.get('mentioned_characters', []):
             return True
         
-        # Check character relevance to topic
-        message = message_context.get('original_message', '').lower()
-        char_keywords = self.extract_character_keywords(character)
-        
-        # Calculate relevance score
-        relevance_score = 0
-        for keyword in char_keywords:
-            if keyword in message:
-                relevance_score += 1
+        # Check character relevance to topic: tokenize the message once
+        # (cached on the context, shared across every character scored
+        # against it) and intersect with the memoized keyword set, so
+        # the hot loop runs as a C-level set operation
+        tokens = message_context.get('_tokens')
+        if tokens is None:
+            tokens = message_context['_tokens'] = frozenset(
+                _WORD_RE.findall(message_context.get('original_message', '').lower())
+            )
         
-        # Respond if relevance is high enough
-        return relevance_score > 0
+        self.extract_character_keywords(character)
+        return not character['_cached_keyword_set'].isdisjoint(tokens)
 
     def extract_character_keywords(self, character: Dict) -> List[str]:
-        """Extract relevant keywords from character profile"""
+        """Extract relevant keywords from character profile, memoized
+
+        The result depends only on the profile text, so it is computed
+        once and stored on the character record together with a
+        frozenset twin for O(1) membership checks.
+        """
+        cached = character.get('_cached_keywords')
+        if cached is not None:
+            return cached
+        
         keywords = []
         
         # Extract from powers/abilities
@@ -267,4 +442,6 @@ Respond with JSON format:
         # Clean and filter keywords
         keywords = [k.strip('.,!?') for k in keywords if len(k) > 3]
         
+        character['_cached_keywords'] = keywords
+        character['_cached_keyword_set'] = frozenset(keywords)
         return keywords
\ No newline at end of file